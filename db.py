@@ -0,0 +1,94 @@
+import atexit
+import sqlite3
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    chat_id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    amount REAL NOT NULL,
+    account_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    transaction_type TEXT NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS balances (
+    chat_id INTEGER NOT NULL,
+    account_id INTEGER NOT NULL,
+    balance REAL NOT NULL,
+    currency TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    account_name TEXT NOT NULL,
+    account_type TEXT NOT NULL,
+    currency TEXT NOT NULL
+);
+-- Covers the latest-balance lookups, so they never touch the table rows
+DROP INDEX IF EXISTS idx_bal_chat_acc;
+CREATE INDEX IF NOT EXISTS idx_bal_latest ON balances(chat_id, account_id, date DESC, balance, currency);
+CREATE INDEX IF NOT EXISTS idx_acc_chat ON accounts(chat_id);
+"""
+
+_connection: sqlite3.Connection | None = None
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open the bot database in autocommit mode and make sure all tables exist.
+    The connection is kept open for the lifetime of the process and closed at exit.
+    """
+    global _connection
+    if _connection is not None:
+        return _connection
+    _connection = sqlite3.connect(path, isolation_level=None)
+    atexit.register(close)
+    _connection.execute("PRAGMA journal_mode=WAL")
+    _connection.execute("PRAGMA synchronous=NORMAL")
+    _connection.executescript(SCHEMA)
+    return _connection
+
+
+def close() -> None:
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+def execute(sql: str, params: tuple = ()) -> sqlite3.Cursor:
+    return _connection.execute(sql, params)
+
+
+def executemany(sql: str, rows) -> sqlite3.Cursor:
+    return _connection.executemany(sql, rows)
+
+
+def fetchone(sql: str, params: tuple = ()) -> tuple | None:
+    return _connection.execute(sql, params).fetchone()
+
+
+def fetchall(sql: str, params: tuple = ()) -> list[tuple]:
+    return _connection.execute(sql, params).fetchall()
+
+
+@contextmanager
+def transaction():
+    """Run the enclosed writes as a single transaction: one commit instead of one per INSERT."""
+    _connection.execute("BEGIN")
+    try:
+        yield
+        _connection.execute("COMMIT")
+    except BaseException:
+        # A failed COMMIT leaves the transaction open; roll it back so later BEGINs work
+        if _connection.in_transaction:
+            _connection.execute("ROLLBACK")
+        raise
@@ -1,83 +1,167 @@
 import os
+import csv
 import logging
-import pandas as pd
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
-from pytz import timezone
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, CommandHandler, ContextTypes, MessageHandler, filters,
-    CallbackQueryHandler, ConversationHandler
+    CallbackQueryHandler, ConversationHandler, PicklePersistence, TypeHandler
 )
 
-# Load environment variables
-load_dotenv()
-bot_api_key = os.getenv("BOT_API_KEY")
+import db
 
-logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+UTC = timezone.utc
+
 # File paths
 data_folder = "data"
-USERS_FILE = "users.csv"
-TRANSACTIONS_FILE = "transactions.csv"
-BALANCES_FILE = "balances.csv"
-ACCOUNTS_FILE = "accounts.csv"
-
-ALL_FILES = {
-    USERS_FILE: ["chat_id", "username"],
-    TRANSACTIONS_FILE: [
+export_folder = os.path.join(data_folder, "export")
+DB_FILE = "bot.db"
+PERSISTENCE_FILE = "ptb_state"
+# PRAGMA user_version once the legacy CSV files have been imported
+CSV_IMPORTED_VERSION = 1
+USERS_TABLE = "users"
+TRANSACTIONS_TABLE = "transactions"
+BALANCES_TABLE = "balances"
+ACCOUNTS_TABLE = "accounts"
+
+ALL_TABLES = {
+    USERS_TABLE: ["chat_id", "username"],
+    TRANSACTIONS_TABLE: [
         "transaction_id", "chat_id", "timestamp", "amount", "account_id",
         "category", "description", "transaction_type", "tags"
     ],
-    BALANCES_FILE: ["chat_id", "account_id", "balance", "currency", "date"],
-    ACCOUNTS_FILE: ["account_id", "chat_id", "account_name", "account_type", "currency"]
+    BALANCES_TABLE: ["chat_id", "account_id", "balance", "currency", "date"],
+    ACCOUNTS_TABLE: ["account_id", "chat_id", "account_name", "account_type", "currency"]
+}
+# Primary keys assigned by SQLite on insert
+AUTO_ID_COLUMNS = {
+    TRANSACTIONS_TABLE: "transaction_id",
+    ACCOUNTS_TABLE: "account_id"
 }
 CATEGORIES = ["зпка", "продукты", "активности", "транспорт", "кафе/рестораны", "депы", "додепы", "покупки", "сервисы"]
 
 # States for ConversationHandler
 ACCOUNT_NAME, ACCOUNT_TYPE, CURRENCY, INITIAL_BALANCE = range(4)
 ACCOUNT_SELECTION, TRANSACTION_AMOUNT, CATEGORY, DESCRIPTION = range(4)
+# Idle conversations are ended after this long so their user_data does not pile up
+CONVERSATION_TIMEOUT = timedelta(minutes=30)
+
+def _chunk2(buttons: list) -> list:
+    """Lay out buttons two per row."""
+    return [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+
+# Static keyboards, built once at import
+ACCOUNT_TYPE_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Обычный", callback_data='usual'),
+     InlineKeyboardButton("Сберегательный", callback_data='savings'),
+     InlineKeyboardButton("Кредитный", callback_data='credit')]
+])
+CURRENCY_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("BYN", callback_data='BYN'),
+     InlineKeyboardButton("USD", callback_data='USD'),
+     InlineKeyboardButton("EUR", callback_data='EUR')]
+])
+CATEGORY_MARKUP = InlineKeyboardMarkup(
+    _chunk2([InlineKeyboardButton(category, callback_data=category) for category in CATEGORIES])
+)
+
+# Entries kept per in-memory cache before the least recently used one is evicted
+CACHE_MAXSIZE = 1024
+
+# chat_ids already stored in the users table, loaded once in init_db
+_known_users: set[int] = set()
+# LRU of account mappings per chat_id; accounts are only created by this bot, so entries
+# are dropped in initial_balance instead of expiring.
+_account_cache: OrderedDict[int, dict] = OrderedDict()
+# LRU of the latest (balance, currency) per (chat_id, account_id), filled lazily and updated on every write
+_latest_balance: OrderedDict[tuple[int, int], tuple[float, str]] = OrderedDict()
+
+def _cache_get(cache: OrderedDict, key):
+    """Return the cached value, or None on a miss, and mark it as recently used."""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def _cache_put(cache: OrderedDict, key, value) -> None:
+    """Store value and evict the least recently used entry once the cache exceeds CACHE_MAXSIZE."""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > CACHE_MAXSIZE:
+        cache.popitem(last=False)
 
 def get_file_path(filename: str) -> str:
     return os.path.join(data_folder, filename)
 
-def init_csvs():
+def get_csv_path(table: str) -> str:
+    return get_file_path(f"{table}.csv")
+
+def get_export_path(table: str) -> str:
+    return os.path.join(export_folder, f"{table}.csv")
+
+def init_db():
     os.makedirs(data_folder, exist_ok=True)
-    for filename, columns in ALL_FILES.items():
-        filepath = get_file_path(filename)
-        if not os.path.exists(filepath):
-            df = pd.DataFrame(columns=columns)
-            df.to_csv(filepath, index=False)
-
-def read_file(filename: str) -> pd.DataFrame:
-    filepath = get_file_path(filename)
-    df = pd.read_csv(filepath)
-    return df
-
-def append_file(filename, **kwargs):
-    filepath = get_file_path(filename)
-    values = [kwargs.get(column_nm, None) for column_nm in ALL_FILES[filename]]
-    if any(v is None for v in values):
-        raise ValueError(f"Not all kwargs were provided for {filename}.\nProvided kwargs: {kwargs}\nColumns expected: {ALL_FILES[filename]}")
-    df = pd.DataFrame(data=[values], columns=ALL_FILES[filename])
-    if os.path.exists(filepath):
-        df.to_csv(filepath, mode='a', header=False, index=False)
-    else:
-        df.to_csv(filepath, index=False)
+    db.connect(get_file_path(DB_FILE))
+    if db.fetchone("PRAGMA user_version")[0] < CSV_IMPORTED_VERSION:
+        import_csvs()
+    _known_users.update(chat_id for (chat_id,) in db.fetchall("SELECT chat_id FROM users"))
 
-def add_user(chat_id, username):
-    users_df = read_file(USERS_FILE)
-    if not users_df["chat_id"].isin([chat_id]).any():
-        append_file(USERS_FILE, chat_id=chat_id, username=username)
+def import_csvs():
+    """
+    Load data left over from the CSV storage. The user_version bump commits together with
+    the imported rows, so a failed import is retried on the next start instead of being skipped.
+    """
+    with db.transaction():
+        # Databases created before user_version was tracked already hold the imported rows
+        if any(db.fetchone(f"SELECT 1 FROM {table} LIMIT 1") for table in ALL_TABLES):
+            db.execute(f"PRAGMA user_version = {CSV_IMPORTED_VERSION}")
+            return
+        for table, columns in ALL_TABLES.items():
+            filepath = get_csv_path(table)
+            if not os.path.exists(filepath):
+                continue
+            with open(filepath, newline='', encoding='utf-8') as f:
+                rows = [tuple(row[column_nm] for column_nm in columns) for row in csv.DictReader(f)]
+            if not rows:
+                continue
+            placeholders = ", ".join("?" for _ in columns)
+            db.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+            logger.info(f"Imported {len(rows)} rows from {filepath}")
+        db.execute(f"PRAGMA user_version = {CSV_IMPORTED_VERSION}")
+
+def export_csvs():
+    """Dump every table to data/export/<table>.csv, never over the CSV files the import reads."""
+    os.makedirs(export_folder, exist_ok=True)
+    for table, columns in ALL_TABLES.items():
+        rows = db.fetchall(f"SELECT {', '.join(columns)} FROM {table}")
+        with open(get_export_path(table), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+def insert_row(table, **kwargs) -> int:
+    """Insert a row and return its rowid, which is the new id for tables in AUTO_ID_COLUMNS."""
+    columns = [column_nm for column_nm in ALL_TABLES[table] if column_nm != AUTO_ID_COLUMNS.get(table)]
+    values = [kwargs.get(column_nm, None) for column_nm in columns]
+    if any(v is None for v in values):
+        raise ValueError(f"Not all kwargs were provided for {table}.\nProvided kwargs: {kwargs}\nColumns expected: {columns}")
+    placeholders = ", ".join("?" for _ in values)
+    cursor = db.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", tuple(values))
+    return cursor.lastrowid
+
+def add_user(chat_id: int, username: str):
+    if chat_id not in _known_users:
+        insert_row(USERS_TABLE, chat_id=chat_id, username=username)
+        _known_users.add(chat_id)
         logger.info(f"Added user {username} with chat_id {chat_id}")
     else:
         logger.info("User already exists.")
 
-def check_if_user_has_an_account(accounts_df, chat_id):
-    user_accounts = accounts_df[accounts_df["chat_id"] == chat_id]
-    return not user_accounts.empty
-
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     username = user.full_name.replace(",", ";")
@@ -112,13 +196,7 @@ async def account_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     context.user_data['account_name'] = account_name_input
 
     # Prompt for account type
-    keyboard = [
-        [InlineKeyboardButton("Обычный", callback_data='usual'),
-         InlineKeyboardButton("Сберегательный", callback_data='savings'),
-         InlineKeyboardButton("Кредитный", callback_data='credit')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Выбери тип счёта:", reply_markup=reply_markup)
+    await update.message.reply_text("Выбери тип счёта:", reply_markup=ACCOUNT_TYPE_MARKUP)
     return ACCOUNT_TYPE
 
 async def account_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -129,13 +207,7 @@ async def account_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     context.user_data['account_type'] = selected_account_type
 
     # Prompt for currency
-    keyboard = [
-        [InlineKeyboardButton("BYN", callback_data='BYN'),
-         InlineKeyboardButton("USD", callback_data='USD'),
-         InlineKeyboardButton("EUR", callback_data='EUR')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.message.reply_text("Выбери валюту:", reply_markup=reply_markup)
+    await query.message.reply_text("Выбери валюту:", reply_markup=CURRENCY_MARKUP)
     return CURRENCY
 
 async def currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -166,32 +238,30 @@ async def initial_balance(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     selected_account_type = context.user_data['account_type']
     selected_currency = context.user_data['currency']
 
-    # Generate unique account_id
-    accounts_df = read_file(ACCOUNTS_FILE)
-    account_id = accounts_df['account_id'].max() + 1 if not accounts_df.empty else 1
-
-    # Save to accounts.csv
+    # Save the account and its initial balance in one transaction
     try:
-        append_file(
-            ACCOUNTS_FILE,
-            account_id=account_id,
-            chat_id=chat_id,
-            account_name=acc_name,
-            account_type=selected_account_type,
-            currency=selected_currency
-        )
+        with db.transaction():
+            account_id = insert_row(
+                ACCOUNTS_TABLE,
+                chat_id=chat_id,
+                account_name=acc_name,
+                account_type=selected_account_type,
+                currency=selected_currency
+            )
+            # Initialize balance for the new account
+            insert_row(
+                BALANCES_TABLE,
+                chat_id=chat_id,
+                account_id=account_id,
+                balance=initial_balance_input,
+                currency=selected_currency,
+                date=datetime.now(UTC).isoformat()
+            )
+        _account_cache.pop(chat_id, None)
+        _cache_put(_latest_balance, (chat_id, account_id), (initial_balance_input, selected_currency))
         await update.message.reply_text(
             f"Счёт `{acc_name}` успешно создан! \U0001F498"
         )
-        # Initialize balance for the new account
-        append_file(
-            BALANCES_FILE,
-            chat_id=chat_id,
-            account_id=account_id,
-            balance=initial_balance_input,
-            currency=selected_currency,
-            date=datetime.now(timezone('UTC')).isoformat()
-        )
     except Exception as e:
         logger.error(f"Error saving account for chat_id {chat_id}: {str(e)}")
         await update.message.reply_text("Не получилось :(")
@@ -207,62 +277,56 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.clear()
     return ConversationHandler.END
 
+async def conversation_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Drop the half-filled conversation data of a user who went idle."""
+    context.user_data.clear()
+
 def get_account_mappings(chat_id: int) -> dict:
-    accounts_df = read_file(ACCOUNTS_FILE)
-    has_account = check_if_user_has_an_account(accounts_df, chat_id)
-    if not has_account:
-        return {}
+    mappings = _cache_get(_account_cache, chat_id)
+    if mappings is not None:
+        return mappings
+    rows = db.fetchall(
+        "SELECT account_id, account_name, account_type, currency FROM accounts WHERE chat_id = ?",
+        (chat_id,)
+    )
     mappings = {
-        row['account_id']: {
-            'account_name': row['account_name'],
-            'account_type': row['account_type'],
-            'currency': row['currency']
+        account_id: {
+            'account_name': account_name,
+            'account_type': account_type,
+            'currency': currency
         }
-        for _, row in accounts_df[accounts_df["chat_id"] == chat_id].iterrows()
+        for account_id, account_name, account_type, currency in rows
     }
+    _cache_put(_account_cache, chat_id, mappings)
     return mappings
 
 async def start_add_transaction(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     chat_id = update.effective_chat.id
-    accounts_df = read_file(ACCOUNTS_FILE)
-    has_account = check_if_user_has_an_account(accounts_df, chat_id)
     message = update.message or update.edited_message
-    if not has_account:
-        await message.reply_text("У тебя пока нет ни одного счёта. :( Жмай /create_account !")
-        return ConversationHandler.END
-
     account_mappings = get_account_mappings(chat_id)
     if not account_mappings:
-        await update.message.reply_text("У тебя пока нет ни одного счёта. :( Жмай /create_account !")
+        await message.reply_text("У тебя пока нет ни одного счёта. :( Жмай /create_account !")
         return ConversationHandler.END
 
-    keyboard = []
-    current_row = []
-    for account_id, info in account_mappings.items():
-        button_text = f"{info['account_name']} ({info['currency']})"
-        button = InlineKeyboardButton(button_text, callback_data=account_id)
-        current_row.append(button)
-        if len(current_row) == 2:
-            keyboard.append(current_row)
-            current_row = []
-    if current_row:
-        keyboard.append(current_row)
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    buttons = [
+        InlineKeyboardButton(f"{info['account_name']} ({info['currency']})", callback_data=account_id)
+        for account_id, info in account_mappings.items()
+    ]
+    reply_markup = InlineKeyboardMarkup(_chunk2(buttons))
     await update.message.reply_text("Выбери нужный счёт:", reply_markup=reply_markup)
     return ACCOUNT_SELECTION
 
 async def handle_account_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
-    account_id = query.data
-    context.user_data['account_id'] = int(account_id)
+    account_id = int(query.data)
+    context.user_data['account_id'] = account_id
 
     # Retrieve account details
     chat_id = update.effective_chat.id
     account_mappings = get_account_mappings(chat_id)
-    account_info = account_mappings.get(int(account_id), {})
+    context.user_data['account_info'] = account_mappings.get(account_id, {})
 
     await query.message.reply_text(
         f"Введи сумму транзакции (e.g., 50.25 or -50.25):"
@@ -276,20 +340,7 @@ async def handle_amount(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         amount = float(amount_text)
         context.user_data['transaction_amount'] = amount
 
-        # Create dynamic keyboard for categories (max 2 per row)
-        keyboard = []
-        current_row = []
-        for category in CATEGORIES:
-            button = InlineKeyboardButton(category, callback_data=category)
-            current_row.append(button)
-            if len(current_row) == 2:
-                keyboard.append(current_row)
-                current_row = []
-        if current_row:
-            keyboard.append(current_row)
-
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("Выбери что больше подходит:", reply_markup=reply_markup)
+        await update.message.reply_text("Выбери что больше подходит:", reply_markup=CATEGORY_MARKUP)
         return CATEGORY
     except ValueError:
         await update.message.reply_text("Сумма транзакции должна быть цифровой:")
@@ -307,45 +358,42 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 def update_balance(chat_id: int, account_id: int, amount: float, acc_currency: str):
     """
-    Update balance in balances.csv for the given chat_id and account_id.
+    Update balance in the balances table for the given chat_id and account_id.
     Uses the latest balance entry for the account and adds the transaction amount.
     Appends a new balance entry without erasing existing data.
+    The caller updates _latest_balance once the surrounding transaction has committed.
 
     Args:
         chat_id (int): The chat_id of the user.
         account_id (int): The account_id to update.
         amount (float): The transaction amount (positive for income, negative for expense).
         acc_currency (str): The currency of the account.
-    """
-    balances_df = read_file(BALANCES_FILE)
 
+    Returns:
+        float: The new balance of the account.
+    """
     # Find the latest balance entry for the chat_id and account_id
-    if not balances_df.empty:
-        existing_balances = balances_df[
-            (balances_df['chat_id'] == chat_id) &
-            (balances_df['account_id'] == account_id)
-            ]
-        if not existing_balances.empty:
-            # Select the latest entry based on full timestamp
-            latest_balance = existing_balances.sort_values(by='date', ascending=False).iloc[0]
-            current_balance = latest_balance['balance']
-            new_balance = current_balance + amount
-        else:
-            # No prior balance for this account; start with the transaction amount
-            new_balance = amount
+    latest_balance = _cache_get(_latest_balance, (chat_id, account_id))
+    if latest_balance is None:
+        latest_balance = db.fetchone(
+            "SELECT balance, currency FROM balances WHERE chat_id = ? AND account_id = ? ORDER BY date DESC LIMIT 1",
+            (chat_id, account_id)
+        )
+    if latest_balance is not None:
+        new_balance = latest_balance[0] + amount
     else:
-        # No balances in the file; start with the transaction amount
+        # No prior balance for this account; start with the transaction amount
         new_balance = amount
 
     # Append new balance entry
     try:
-        append_file(
-            BALANCES_FILE,
+        insert_row(
+            BALANCES_TABLE,
             chat_id=chat_id,
             account_id=account_id,
             balance=new_balance,
             currency=acc_currency,
-            date=datetime.now(timezone('UTC')).isoformat()
+            date=datetime.now(UTC).isoformat()
         )
     except Exception as e:
         logger.error(f"Error appending balance for chat_id {chat_id}, account_id {account_id}: {str(e)}")
@@ -364,27 +412,25 @@ async def handle_description(update: Update, context: ContextTypes.DEFAULT_TYPE)
     account_id = context.user_data['account_id']
     amount = context.user_data['transaction_amount']
     category = context.user_data['category']
-    account_mappings = get_account_mappings(chat_id)
-    account_info = account_mappings.get(account_id, {})
+    account_info = context.user_data['account_info']
 
-    # Save transaction to transactions.csv
-    transactions_df = read_file(TRANSACTIONS_FILE)
-    transaction_id = transactions_df['transaction_id'].max() + 1 if not transactions_df.empty else 1
+    # Save transaction to transactions
     try:
-        append_file(
-            TRANSACTIONS_FILE,
-            transaction_id=transaction_id,
-            chat_id=chat_id,
-            timestamp=datetime.now(timezone('UTC')).isoformat(),
-            amount=amount,
-            account_id=account_id,
-            category=category,
-            description=description,
-            transaction_type="income" if amount > 0 else "expense",
-            tags=""
-        )
-        # Update balance
-        new_balance = update_balance(chat_id, account_id, amount, account_info['currency'])
+        with db.transaction():
+            insert_row(
+                TRANSACTIONS_TABLE,
+                chat_id=chat_id,
+                timestamp=datetime.now(UTC).isoformat(),
+                amount=amount,
+                account_id=account_id,
+                category=category,
+                description=description,
+                transaction_type="income" if amount > 0 else "expense",
+                tags=""
+            )
+            # Update balance
+            new_balance = update_balance(chat_id, account_id, amount, account_info['currency'])
+        _cache_put(_latest_balance, (chat_id, account_id), (new_balance, account_info['currency']))
 
         await update.message.reply_text(
             f"Теперь на твоем счету `{account_info['account_name']}` целых {new_balance:.2f} {account_info['currency']}! \U0001F970"
@@ -400,7 +446,7 @@ async def handle_description(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 def get_latest_balances(chat_id: int) -> dict:
     """
-    Aggregate balances by account_id for a given chat_id, inner join with accounts to get account_name,
+    Aggregate balances by account_id for a given chat_id, look up account_name in the cached account mappings,
     and return a dictionary with account_name as keys and a dict of balance and currency as values.
 
     Args:
@@ -410,34 +456,28 @@ def get_latest_balances(chat_id: int) -> dict:
         dict: A dictionary mapping account_name to {'balance': float, 'currency': str}.
               Returns empty dict if no balances or matching accounts found.
     """
-    balances_df = read_file(BALANCES_FILE)
-    accounts_df = read_file(ACCOUNTS_FILE)
-
-    user_balances = balances_df[balances_df['chat_id'] == chat_id]
-    if user_balances.empty:
+    account_mappings = get_account_mappings(chat_id)
+    if not account_mappings:
         return {}
 
-    user_balances['date'] = pd.to_datetime(user_balances['date'])
-
-    latest_balances = (
-        user_balances.sort_values('date', ascending=False)
-        .groupby('account_id')
-        .first()
-        .reset_index()
-    )
-
-    merged_df = latest_balances.merge(
-        accounts_df[['account_id', 'account_name']],
-        on='account_id',
-        how='inner'
+    # With a bare MAX(), SQLite takes balance and currency from the row holding the max date
+    rows = db.fetchall(
+        """
+        SELECT account_id, balance, currency, MAX(date)
+        FROM balances
+        WHERE chat_id = ?
+        GROUP BY account_id
+        """,
+        (chat_id,)
     )
 
     balance_mappings = {
-        row['account_name']: {
-            'balance': row['balance'],
-            'currency': row['currency']
+        account_mappings[account_id]['account_name']: {
+            'balance': balance,
+            'currency': currency
         }
-        for _, row in merged_df.iterrows()
+        for account_id, balance, currency, _ in rows
+        if account_id in account_mappings
     }
 
     return balance_mappings
@@ -460,10 +500,25 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     logger.error(f"Update {update} caused error {context.error}")
 
 def main() -> None:
-    init_csvs()
+    # Load environment variables
+    load_dotenv()
+    bot_api_key = os.getenv("BOT_API_KEY")
+    # When set, updates are received through a webhook instead of long polling
+    webhook_url = os.getenv("WEBHOOK_URL")
+    webhook_listen = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    webhook_port = int(os.getenv("WEBHOOK_PORT", "8443"))
+    # Telegram sends this back in every webhook request, so forged updates can be rejected
+    webhook_secret = os.getenv("WEBHOOK_SECRET")
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    if webhook_url and not webhook_secret:
+        logger.error("WEBHOOK_SECRET must be set when WEBHOOK_URL is used")
+        return
+    init_db()
 
     try:
-        application = Application.builder().token(bot_api_key).build()
+        persistence = PicklePersistence(filepath=get_file_path(PERSISTENCE_FILE))
+        application = Application.builder().token(bot_api_key).persistence(persistence).build()
         logger.info("Application initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Application: {str(e)}")
@@ -477,8 +532,12 @@ def main() -> None:
             ACCOUNT_TYPE: [CallbackQueryHandler(account_type)],
             CURRENCY: [CallbackQueryHandler(currency)],
             INITIAL_BALANCE: [MessageHandler(filters.TEXT & ~filters.COMMAND, initial_balance)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        name="account_creation",
+        persistent=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     transaction_handler = ConversationHandler(
@@ -488,8 +547,12 @@ def main() -> None:
             TRANSACTION_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_amount)],
             CATEGORY: [CallbackQueryHandler(handle_category)],
             DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_description)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        name="add_transaction",
+        persistent=True,
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     # Add handlers
@@ -499,7 +562,18 @@ def main() -> None:
     application.add_handler(CommandHandler("balance", show_balance))
     application.add_error_handler(error_handler)
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if webhook_url:
+        application.run_webhook(
+            listen=webhook_listen,
+            port=webhook_port,
+            webhook_url=webhook_url,
+            url_path=urlsplit(webhook_url).path.lstrip("/"),
+            secret_token=webhook_secret,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+    export_csvs()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file